@@ -0,0 +1,35 @@
+"""
+Shared HTTP client setup for the scrapers.
+
+Scrapers build their own client with new_client() and close it on exit;
+a client passed in by the caller is shared and left open.
+"""
+
+from pathlib import Path
+from typing import Optional
+
+import hishel
+import httpx
+
+
+# Sized so a scraper's concurrent fetches reuse pooled connections
+LIMITS = httpx.Limits(
+    max_keepalive_connections=64,
+    max_connections=128,
+    keepalive_expiry=30
+)
+
+
+def new_client(
+    cache_dir: Optional[str] = None, cache_ttl: int = 3600, **client_kwargs
+) -> httpx.AsyncClient:
+    """Create an HTTP/2 client, optionally backed by an on-disk response cache"""
+    client_kwargs.setdefault("limits", LIMITS)
+    if cache_dir:
+        # Revalidates with ETag/If-None-Match, so unchanged resources cost a 304
+        return hishel.AsyncCacheClient(
+            storage=hishel.AsyncFileStorage(base_path=Path(cache_dir), ttl=cache_ttl),
+            http2=True,
+            **client_kwargs
+        )
+    return httpx.AsyncClient(http2=True, **client_kwargs)
@@ -5,12 +5,20 @@ Extracts code snippets from GitHub Gists.
 """
 
 import asyncio
-import httpx
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 from typing import Optional
-from pydantic import BaseModel, Field
+
+import httpx
+import msgspec
+
+from ._http import new_client
 
 
-class GistFile(BaseModel):
+@dataclass(slots=True)
+class GistFile:
     """Gist file"""
     filename: str
     language: str = ""
@@ -19,11 +27,12 @@ class GistFile(BaseModel):
     content: str = ""
 
 
-class Gist(BaseModel):
+@dataclass(slots=True)
+class Gist:
     """GitHub Gist"""
     id: str
     description: str = ""
-    files: list[GistFile] = Field(default_factory=list)
+    files: list[GistFile] = field(default_factory=list)
     author: str = ""
     created_at: str = ""
     updated_at: str = ""
@@ -31,22 +40,82 @@ class Gist(BaseModel):
     forks_url: str = ""
 
 
+class _GistFileRaw(msgspec.Struct):
+    """File entry as returned by the GitHub API"""
+    language: Optional[str] = None
+    raw_url: str = ""
+    size: int = 0
+
+
+class _GistOwnerRaw(msgspec.Struct):
+    login: str = ""
+
+
+class _GistRaw(msgspec.Struct):
+    """Gist as returned by the GitHub API (only the fields we read)"""
+    id: str = ""
+    description: Optional[str] = None
+    files: dict[str, _GistFileRaw] = {}
+    owner: Optional[_GistOwnerRaw] = None
+    created_at: str = ""
+    updated_at: str = ""
+    public: bool = True
+    forks_url: str = ""
+
+
+_GIST_DECODER = msgspec.json.Decoder(_GistRaw)
+_GIST_LIST_DECODER = msgspec.json.Decoder(list[_GistRaw])
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait for a Retry-After value; None if absent or invalid"""
+    if value is None:
+        return None
+    try:
+        return float(max(int(value), 0))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
 class GistScraper:
     """Scraper for GitHub Gists"""
     
     BASE_URL = "https://api.github.com"
+    MAX_RETRIES = 5
+    # Longest we sleep for a rate limit to clear before handing the 403/429 to the caller
+    MAX_RATE_LIMIT_WAIT = 60
     
-    def __init__(self, token: Optional[str] = None):
+    def __init__(
+        self,
+        token: Optional[str] = None,
+        cache_dir: Optional[str] = None,
+        cache_ttl: int = 3600,
+        client: Optional[httpx.AsyncClient] = None
+    ):
         self.headers = {
             "User-Agent": "Gist-Scraper/1.0",
             "Accept": "application/vnd.github.v3+json"
         }
         if token:
             self.headers["Authorization"] = f"token {token}"
-        self.client = httpx.AsyncClient(headers=self.headers)
+        
+        self._owns_client = client is None
+        self.client = client or new_client(cache_dir, cache_ttl)
+        
+        # Last seen X-RateLimit-* values
+        self.rate_limit_remaining: Optional[int] = None
+        self.rate_limit_reset: Optional[int] = None
     
     async def close(self):
-        await self.client.aclose()
+        if self._owns_client:
+            await self.client.aclose()
     
     async def __aenter__(self):
         return self
@@ -54,106 +123,183 @@ class GistScraper:
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         await self.close()
     
+    def _rate_limit_wait(self) -> Optional[float]:
+        """Seconds until an exhausted primary rate limit resets, or None if it isn't exhausted"""
+        if self.rate_limit_remaining != 0 or self.rate_limit_reset is None:
+            return None
+        return max(self.rate_limit_reset - time.time(), 0.0)
+    
+    async def _get(self, url: str, **kwargs) -> httpx.Response:
+        """GET that waits out short rate limits and backs off on transient 5xx errors.
+        
+        Returns the last response once MAX_RETRIES is used up, or straight away when a
+        rate limit would take longer than MAX_RATE_LIMIT_WAIT to clear.
+        """
+        wait = self._rate_limit_wait()
+        if wait and wait <= self.MAX_RATE_LIMIT_WAIT:
+            await asyncio.sleep(wait)
+        
+        for attempt in range(self.MAX_RETRIES):
+            response = await self.client.get(url, headers=self.headers, **kwargs)
+            
+            if "x-ratelimit-remaining" in response.headers:
+                self.rate_limit_remaining = int(response.headers["x-ratelimit-remaining"])
+                self.rate_limit_reset = int(response.headers.get("x-ratelimit-reset", 0))
+            
+            if response.status_code in (403, 429):
+                delay = _parse_retry_after(response.headers.get("retry-after"))
+                if delay is None:
+                    delay = self._rate_limit_wait()
+                if delay is None or delay > self.MAX_RATE_LIMIT_WAIT:
+                    return response
+            elif response.status_code >= 500:
+                delay = 2 ** attempt
+            else:
+                return response
+            
+            if attempt < self.MAX_RETRIES - 1:
+                await asyncio.sleep(delay)
+        
+        return response
+    
     async def get_gist(self, gist_id: str) -> Gist:
         """Get a single gist"""
-        response = await self.client.get(f"{self.BASE_URL}/gists/{gist_id}")
+        response = await self._get(f"{self.BASE_URL}/gists/{gist_id}")
         response.raise_for_status()
-        data = response.json()
-        
-        files = []
-        for filename, file_data in data.get("files", {}).items():
-            files.append(GistFile(
-                filename=filename,
-                language=file_data.get("language", ""),
-                raw_url=file_data.get("raw_url", ""),
-                size=file_data.get("size", 0)
-            ))
-        
+        return self._parse_gist(_GIST_DECODER.decode(response.content))
+    
+    def _parse_gist(self, raw: _GistRaw) -> Gist:
+        """Build a Gist from a decoded API payload"""
         return Gist(
-            id=gist_id,
-            description=data.get("description", ""),
-            files=files,
-            author=data.get("user", {}).get("login", ""),
-            created_at=data.get("created_at", ""),
-            updated_at=data.get("updated_at", ""),
-            public=data.get("public", True),
-            forks_url=data.get("forks_url", "")
+            id=raw.id,
+            description=raw.description or "",
+            files=[
+                GistFile(
+                    filename=filename,
+                    language=file_data.language or "",
+                    raw_url=file_data.raw_url,
+                    size=file_data.size
+                )
+                for filename, file_data in raw.files.items()
+            ],
+            author=raw.owner.login if raw.owner else "",
+            created_at=raw.created_at,
+            updated_at=raw.updated_at,
+            public=raw.public,
+            forks_url=raw.forks_url
         )
     
     async def get_gist_content(self, raw_url: str) -> str:
         """Get raw content of a gist file"""
-        response = await self.client.get(raw_url)
-        response.raise_for_status()
-        return response.text
+        buf = bytearray()
+        async with self.client.stream("GET", raw_url, headers=self.headers) as response:
+            response.raise_for_status()
+            async for chunk in response.aiter_bytes():
+                buf.extend(chunk)
+        return buf.decode("utf-8", errors="replace")
     
-    async def search_gists(self, query: str, per_page: int = 30) -> list[Gist]:
-        """Search gists"""
-        response = await self.client.get(
-            f"{self.BASE_URL}/gists/public",
-            params={"per_page": per_page}
-        )
-        response.raise_for_status()
+    async def fetch_all_content(self, gists: list[Gist], concurrency: int = 20) -> None:
+        """Fill in the content of every file in the given gists concurrently.
         
-        gists = []
-        for data in response.json():
-            if query.lower() in data.get("description", "").lower():
-                files = []
-                for filename, file_data in data.get("files", {}).items():
-                    files.append(GistFile(
-                        filename=filename,
-                        language=file_data.get("language", ""),
-                        raw_url=file_data.get("raw_url", ""),
-                        size=file_data.get("size", 0)
-                    ))
-                
-                gists.append(Gist(
-                    id=data.get("id", ""),
-                    description=data.get("description", ""),
-                    files=files,
-                    author=data.get("user", {}).get("login", ""),
-                    created_at=data.get("created_at", ""),
-                    updated_at=data.get("updated_at", ""),
-                    public=data.get("public", True)
-                ))
+        A file whose download fails keeps empty content; the others are still filled.
+        """
+        sem = asyncio.BoundedSemaphore(concurrency)
         
+        async def _one(gist_file: GistFile):
+            async with sem:
+                try:
+                    gist_file.content = await self.get_gist_content(gist_file.raw_url)
+                except httpx.HTTPError:
+                    pass
+        
+        await asyncio.gather(*[
+            _one(f) for gist in gists for f in gist.files if f.raw_url
+        ])
+    
+    async def _get_gist_pages(
+        self, url: str, limit: int, params: Optional[dict] = None, concurrency: int = 5
+    ) -> list[_GistRaw]:
+        """Fetch the first `limit` gists from a paginated listing.
+        
+        Pages hold up to 100 gists (GitHub's maximum); the pages needed to cover
+        `limit` are fetched concurrently and the result is cut to `limit`.
+        """
+        if limit <= 0:
+            return []
+        per_page = min(limit, 100)
+        pages = (limit + per_page - 1) // per_page
+        sem = asyncio.BoundedSemaphore(concurrency)
+        
+        async def _page(page: int) -> list[_GistRaw]:
+            async with sem:
+                response = await self._get(
+                    url,
+                    params={**(params or {}), "per_page": per_page, "page": page}
+                )
+                response.raise_for_status()
+                return _GIST_LIST_DECODER.decode(response.content)
+        
+        results = await asyncio.gather(*[_page(p) for p in range(1, pages + 1)])
+        return [raw for page in results for raw in page][:limit]
+    
+    async def get_public_gists(
+        self, limit: int = 100, since: Optional[str] = None, fetch_content: bool = False
+    ) -> list[Gist]:
+        """Get the most recent public gists, optionally only those updated after `since`"""
+        gists = [
+            self._parse_gist(raw)
+            for raw in await self._get_gist_pages(
+                f"{self.BASE_URL}/gists/public",
+                limit,
+                params={"since": since} if since else None
+            )
+        ]
+        
+        if fetch_content:
+            await self.fetch_all_content(gists)
+        return gists
+    
+    async def search_gists(
+        self, query: str, limit: int = 30, fetch_content: bool = False
+    ) -> list[Gist]:
+        """Search the `limit` most recent public gists by description or filename"""
+        raws = await self._get_gist_pages(f"{self.BASE_URL}/gists/public", limit)
+        q = query.lower()
+        gists = [
+            self._parse_gist(raw)
+            for raw in raws
+            if q in (raw.description or "").lower()
+            or any(q in filename.lower() for filename in raw.files)
+        ]
+        
+        if fetch_content:
+            await self.fetch_all_content(gists)
         return gists
     
-    async def get_user_gists(self, username: str, per_page: int = 100) -> list[Gist]:
+    async def get_user_gists(
+        self, username: str, per_page: int = 100, fetch_content: bool = False
+    ) -> list[Gist]:
         """Get all gists for a user"""
-        response = await self.client.get(
+        response = await self._get(
             f"{self.BASE_URL}/users/{username}/gists",
             params={"per_page": per_page}
         )
         response.raise_for_status()
         
-        gists = []
-        for data in response.json():
-            files = []
-            for filename, file_data in data.get("files", {}).items():
-                files.append(GistFile(
-                    filename=filename,
-                    language=file_data.get("language", ""),
-                    raw_url=file_data.get("raw_url", ""),
-                    size=file_data.get("size", 0)
-                ))
-            
-            gists.append(Gist(
-                id=data.get("id", ""),
-                description=data.get("description", ""),
-                files=files,
-                author=username,
-                created_at=data.get("created_at", ""),
-                updated_at=data.get("updated_at", ""),
-                public=data.get("public", True)
-            ))
+        gists = [
+            self._parse_gist(raw)
+            for raw in _GIST_LIST_DECODER.decode(response.content)
+        ]
         
+        if fetch_content:
+            await self.fetch_all_content(gists)
         return gists
 
 
 async def main():
     """Example usage"""
     
-    async with GistScraper() as scraper:
+    async with GistScraper(cache_dir=".cache/http") as scraper:
         # Search for Python gists
         print("Searching gists...")
         gists = await scraper.search_gists("python")
@@ -167,4 +313,9 @@ async def main():
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    try:
+        import uvloop
+    except ImportError:
+        asyncio.run(main())
+    else:
+        uvloop.run(main())
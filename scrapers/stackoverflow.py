@@ -6,15 +6,61 @@ Extracts code snippets from Stack Overflow answers.
 
 import asyncio
 import re
+from dataclasses import dataclass, field
 from datetime import datetime
 from typing import Optional
 
 import httpx
-from bs4 import BeautifulSoup
-from pydantic import BaseModel, Field
+from selectolax.lexbor import LexborHTMLParser, LexborNode
 
+from ._http import new_client
 
-class CodeSnippet(BaseModel):
+
+_RE_QUESTION_ID = re.compile(r"/questions/(\d+)")
+_RE_ANSWER_NAME = re.compile(r"answer-(\d+)")
+_RE_REGEX_META = re.compile(r"[\\.^$*+?{}\[\]|()]")
+
+# CSS selectors for the Stack Overflow page structure
+_SEL_QUESTION_SUMMARY = "div.question-summary"
+_SEL_QUESTION_LINK = "a.question-hyperlink"
+_SEL_VOTES = "span.vote-count-post"
+_SEL_ANSWER = "div.answer"
+_SEL_ANSWER_ANCHOR = 'a[name^="answer-"]'
+_SEL_CODE = "code"
+
+# Question tags that name a language, and aliases mapped to our language names
+_LANG_TAGS = frozenset({
+    "python", "javascript", "typescript", "java", "c#", "csharp",
+    "go", "golang", "rust", "ruby", "php", "sql", "bash", "shell"
+})
+_LANG_TAG_MAP = {"golang": "go", "csharp": "c#"}
+
+
+def _to_int(node: Optional[LexborNode]) -> int:
+    """Parse a count such as '1,204' from a node's text; 0 if missing or not a number"""
+    if node is None:
+        return 0
+    try:
+        return int(node.text(strip=True).replace(",", ""))
+    except ValueError:
+        return 0
+
+
+def _compile_language_patterns(
+    language_patterns: dict[str, list[str]]
+) -> dict[str, tuple[tuple[str, ...], Optional[re.Pattern]]]:
+    """Split each language's patterns into lower-cased literals and one compiled regex"""
+    matchers = {}
+    for language, patterns in language_patterns.items():
+        literals = tuple(p.lower() for p in patterns if not _RE_REGEX_META.search(p))
+        regexes = [p for p in patterns if _RE_REGEX_META.search(p)]
+        regex = re.compile("|".join(f"(?:{p})" for p in regexes), re.IGNORECASE) if regexes else None
+        matchers[language] = (literals, regex)
+    return matchers
+
+
+@dataclass(slots=True, kw_only=True)
+class CodeSnippet:
     """A code snippet from Stack Overflow"""
     snippet_id: str
     question_id: int
@@ -24,8 +70,8 @@ class CodeSnippet(BaseModel):
     language: Optional[str] = None
     votes: int = 0
     url: str
-    tags: list[str] = Field(default_factory=list)
-    scraped_at: datetime = Field(default_factory=datetime.now)
+    tags: list[str] = field(default_factory=list)
+    scraped_at: Optional[datetime] = None
     
     def to_dict(self):
         return {
@@ -38,7 +84,7 @@ class CodeSnippet(BaseModel):
             "votes": self.votes,
             "url": self.url,
             "tags": self.tags,
-            "scraped_at": self.scraped_at.isoformat()
+            "scraped_at": self.scraped_at.isoformat() if self.scraped_at else None
         }
 
 
@@ -65,15 +111,24 @@ class StackOverflowScraper:
         "bash": [r"#!/bin/bash", r"echo ", r"\$\(", r"if \[\["],
     }
     
-    def __init__(self, timeout: int = 30):
-        self.client = httpx.AsyncClient(
-            headers=self.HEADERS,
-            timeout=timeout,
-            follow_redirects=True
+    # Literal patterns are checked with substring search, the rest with one regex per language
+    LANGUAGE_MATCHERS = _compile_language_patterns(LANGUAGE_PATTERNS)
+    
+    def __init__(
+        self,
+        timeout: int = 30,
+        cache_dir: Optional[str] = None,
+        cache_ttl: int = 3600,
+        client: Optional[httpx.AsyncClient] = None
+    ):
+        self._owns_client = client is None
+        self.client = client or new_client(
+            cache_dir, cache_ttl, timeout=timeout, follow_redirects=True
         )
     
     async def close(self):
-        await self.client.aclose()
+        if self._owns_client:
+            await self.client.aclose()
     
     async def __aenter__(self):
         return self
@@ -81,58 +136,77 @@ class StackOverflowScraper:
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         await self.close()
     
-    async def search(self, query: str, limit: int = 10) -> list[CodeSnippet]:
-        """Search Stack Overflow and extract code snippets"""
+    async def search(
+        self, query: str, limit: int = 10, concurrency: int = 10
+    ) -> list[CodeSnippet]:
+        """Search Stack Overflow and extract code snippets from the top `limit` questions"""
         url = f"{self.BASE_URL}/search"
         params = {"q": query, "sort": "relevance"}
+        scraped_at = datetime.now()
         
-        response = await self.client.get(url, params=params)
+        response = await self.client.get(url, params=params, headers=self.HEADERS)
         response.raise_for_status()
         
-        soup = BeautifulSoup(response.text, "lxml")
-        return self._parse_search_results(soup, query, limit)
+        tree = LexborHTMLParser(response.text)
+        questions = self._parse_search_results(tree, query, limit, scraped_at)
+        
+        # Fetch all question pages concurrently; a page that fails contributes no snippets
+        sem = asyncio.BoundedSemaphore(concurrency)
+        
+        async def _enrich(question: CodeSnippet) -> list[CodeSnippet]:
+            async with sem:
+                try:
+                    return await self.get_answer_snippets(question.question_id, scraped_at)
+                except httpx.HTTPError:
+                    return []
+        
+        enriched = await asyncio.gather(*[_enrich(q) for q in questions])
+        return [snippet for snippets in enriched for snippet in snippets]
     
-    async def get_answer_snippets(self, question_id: int) -> list[CodeSnippet]:
+    async def get_answer_snippets(
+        self, question_id: int, scraped_at: Optional[datetime] = None
+    ) -> list[CodeSnippet]:
         """Get code snippets from a question page"""
         url = f"{self.BASE_URL}/questions/{question_id}"
+        scraped_at = scraped_at or datetime.now()
         
-        response = await self.client.get(url)
+        response = await self.client.get(url, headers=self.HEADERS)
         response.raise_for_status()
         
-        soup = BeautifulSoup(response.text, "lxml")
-        return self._parse_question_page(soup, question_id)
+        tree = LexborHTMLParser(response.text)
+        return self._parse_question_page(tree, question_id, scraped_at)
     
-    def _parse_search_results(self, soup: BeautifulSoup, query: str, limit: int) -> list[CodeSnippet]:
+    def _parse_search_results(
+        self, tree: LexborHTMLParser, query: str, limit: int, scraped_at: datetime
+    ) -> list[CodeSnippet]:
         """Parse search results page"""
         snippets = []
         
         # Find question links
-        results = soup.find_all("div", {"class": re.compile(r"question-summary")})
+        results = tree.css(_SEL_QUESTION_SUMMARY)
         
         for result in results[:limit]:
-            link = result.find("a", {"class": re.compile(r"question-hyperlink")})
+            link = result.css_first(_SEL_QUESTION_LINK)
             if not link:
                 continue
             
-            question_title = link.get_text()
-            href = link.get("href", "")
+            question_title = link.text()
+            href = link.attributes.get("href") or ""
             
             # Extract question ID
-            match = re.search(r"/questions/(\d+)", href)
+            match = _RE_QUESTION_ID.search(href)
             if not match:
                 continue
             
             question_id = int(match.group(1))
             
             # Get votes
-            votes_elem = result.find("span", {"class": re.compile(r"vote-count-post")})
-            votes = int(votes_elem.get_text()) if votes_elem else 0
+            votes = _to_int(result.css_first(_SEL_VOTES))
             
             # Get URL
             url = f"{self.BASE_URL}{href}"
             
-            # For now, create placeholder snippet
-            # In real implementation, would fetch the answer page
+            # Placeholder without code; search() fetches the answers
             snippets.append(CodeSnippet(
                 snippet_id=f"so_{question_id}",
                 question_id=question_id,
@@ -141,32 +215,42 @@ class StackOverflowScraper:
                 code="",
                 votes=votes,
                 url=url,
-                tags=[]
+                tags=[],
+                scraped_at=scraped_at
             ))
         
         return snippets
     
-    def _parse_question_page(self, soup: BeautifulSoup, question_id: int) -> list[CodeSnippet]:
+    def _parse_question_page(
+        self, tree: LexborHTMLParser, question_id: int, scraped_at: datetime
+    ) -> list[CodeSnippet]:
         """Parse question page for code snippets"""
         snippets = []
         
         # Get question title
-        title_elem = soup.find("a", {"class": re.compile(r"question-hyperlink")})
-        question_title = title_elem.get_text() if title_elem else ""
+        title_elem = tree.css_first(_SEL_QUESTION_LINK)
+        question_title = title_elem.text() if title_elem else ""
         
         # Get all code blocks in answers
-        answer_divs = soup.find_all("div", {"class": re.compile(r"answer")})
+        answer_divs = tree.css(_SEL_ANSWER)
         
         for idx, answer in enumerate(answer_divs):
             # Get votes
-            votes_elem = answer.find("span", {"class": re.compile(r"vote-count-post")})
-            votes = int(votes_elem.get_text()) if votes_elem else 0
+            votes = _to_int(answer.css_first(_SEL_VOTES))
+            
+            # Get answer ID from its anchor
+            answer_link = answer.css_first(_SEL_ANSWER_ANCHOR)
+            answer_id = idx + 1
+            if answer_link:
+                match = _RE_ANSWER_NAME.search(answer_link.attributes.get("name") or "")
+                if match:
+                    answer_id = int(match.group(1))
             
             # Get code blocks
-            code_blocks = answer.find_all("code")
+            code_blocks = answer.css(_SEL_CODE)
             
             for code in code_blocks:
-                code_text = code.get_text().strip()
+                code_text = code.text().strip()
                 
                 # Skip if too short
                 if len(code_text) < 20:
@@ -175,14 +259,6 @@ class StackOverflowScraper:
                 # Detect language
                 language = self._detect_language(code_text)
                 
-                # Get parent link for URL
-                answer_link = answer.find("a", {"name": re.compile(r"^answer-")})
-                answer_id = idx + 1
-                if answer_link:
-                    match = re.search(r"answer-(\d+)", answer_link.get("name", ""))
-                    if match:
-                        answer_id = int(match.group(1))
-                
                 snippets.append(CodeSnippet(
                     snippet_id=f"so_{question_id}_{answer_id}",
                     question_id=question_id,
@@ -192,7 +268,8 @@ class StackOverflowScraper:
                     language=language,
                     votes=votes,
                     url=f"{self.BASE_URL}/questions/{question_id}#answer-{answer_id}",
-                    tags=[]
+                    tags=[],
+                    scraped_at=scraped_at
                 ))
         
         return snippets
@@ -201,27 +278,20 @@ class StackOverflowScraper:
         """Detect programming language from code"""
         code_lower = code.lower()
         
-        for language, patterns in self.LANGUAGE_PATTERNS.items():
-            for pattern in patterns:
-                if re.search(pattern, code, re.IGNORECASE):
-                    return language
+        for language, (literals, regex) in self.LANGUAGE_MATCHERS.items():
+            if any(literal in code_lower for literal in literals):
+                return language
+            if regex and regex.search(code):
+                return language
         
         return None
     
     def extract_language_from_tags(self, tags: list[str]) -> Optional[str]:
         """Extract language from question tags"""
-        language_tags = {
-            "python", "javascript", "typescript", "java", "c#", "csharp",
-            "go", "golang", "rust", "ruby", "php", "sql", "bash", "shell"
-        }
-        
         for tag in tags:
-            if tag.lower() in language_tags:
-                if tag.lower() == "golang":
-                    return "go"
-                if tag.lower() == "csharp":
-                    return "c#"
-                return tag.lower()
+            tag = tag.lower()
+            if tag in _LANG_TAGS:
+                return _LANG_TAG_MAP.get(tag, tag)
         
         return None
 
@@ -236,28 +306,91 @@ EXAMPLE_QUERIES = [
 ]
 
 
+# Shared by the convenience functions so repeated calls reuse one warm connection pool
+_shared_client: Optional[httpx.AsyncClient] = None
+_shared_client_loop: Optional[asyncio.AbstractEventLoop] = None
+_shared_client_guard: Optional[asyncio.Task] = None
+
+
+async def _close_on_loop_shutdown(client: httpx.AsyncClient):
+    """Keep `client` open until this task is cancelled, then close it on its own loop.
+    
+    asyncio.run() cancels leftover tasks before closing the loop, so the shared
+    client's connections are released while the loop that owns them still runs.
+    """
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await client.aclose()
+
+
+def _release_shared_client():
+    """Forget the shared client, closing it first if it belongs to the running loop.
+    
+    A client from an earlier loop was already closed by its guard task when that
+    loop shut down; its connections can't be touched from this loop.
+    """
+    global _shared_client, _shared_client_loop, _shared_client_guard
+    if _shared_client_guard is not None and _shared_client_loop is asyncio.get_running_loop():
+        _shared_client_guard.cancel()
+    _shared_client = None
+    _shared_client_loop = None
+    _shared_client_guard = None
+
+
+def _get_shared_client() -> httpx.AsyncClient:
+    """Get the shared client, creating it if missing, closed, or bound to another event loop"""
+    global _shared_client, _shared_client_loop, _shared_client_guard
+    loop = asyncio.get_running_loop()
+    if _shared_client is not None and not _shared_client.is_closed and _shared_client_loop is loop:
+        return _shared_client
+    
+    # Nothing here awaits, so concurrent callers can't create two clients
+    _release_shared_client()
+    _shared_client = new_client(timeout=30, follow_redirects=True)
+    _shared_client_loop = loop
+    _shared_client_guard = loop.create_task(_close_on_loop_shutdown(_shared_client))
+    return _shared_client
+
+
+async def close_shared_client():
+    """Close the client shared by the convenience functions"""
+    guard = _shared_client_guard
+    _release_shared_client()
+    if guard is not None and guard.get_loop() is asyncio.get_running_loop():
+        # Let the cancelled guard finish closing the client before returning
+        await asyncio.wait([guard])
+
+
 async def search_snippets(query: str) -> list[CodeSnippet]:
     """Convenience function to search snippets"""
-    async with StackOverflowScraper() as scraper:
+    async with StackOverflowScraper(client=_get_shared_client()) as scraper:
         return await scraper.search(query)
 
 
 if __name__ == "__main__":
-    import json
     import sys
     
+    import orjson
+    
     async def main():
         query = sys.argv[1] if len(sys.argv) > 1 else "python parse json"
         
         print(f"Searching: {query}")
-        results = await search_snippets(query)
+        async with StackOverflowScraper(cache_dir=".cache/http") as scraper:
+            results = await scraper.search(query)
         
-        print(f"\nFound {len(results)} questions:")
+        print(f"\nFound {len(results)} snippets:")
         for r in results[:5]:
-            print(f"  - {r.question_title} ({r.votes} votes)")
+            print(f"  - {r.question_title} [{r.language or 'unknown'}] ({r.votes} votes)")
         
         # Save
-        with open(f"data/so_{query.replace(' ', '_')}.json", "w") as f:
-            json.dump([s.to_dict() for s in results], f, indent=2)
+        with open(f"data/so_{query.replace(' ', '_')}.json", "wb") as f:
+            f.write(orjson.dumps([s.to_dict() for s in results], option=orjson.OPT_INDENT_2))
     
-    asyncio.run(main())
+    try:
+        import uvloop
+    except ImportError:
+        asyncio.run(main())
+    else:
+        uvloop.run(main())
@@ -0,0 +1,294 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import httpx
+import pytest
+
+from scrapers.github_gist import Gist, GistFile, GistScraper
+
+
+def run_with(handler, coro_fn):
+    """Run coro_fn(scraper) against a GistScraper backed by a MockTransport"""
+    async def _run():
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        async with GistScraper(client=client) as scraper:
+            try:
+                return await coro_fn(scraper)
+            finally:
+                await client.aclose()
+    return asyncio.run(_run())
+
+
+def test_fetch_all_content_skips_failed_files():
+    def handler(request):
+        if request.url.path == "/dead.py":
+            return httpx.Response(404)
+        if request.url.path == "/broken.py":
+            raise httpx.ConnectError("connection refused", request=request)
+        return httpx.Response(200, content=f"# {request.url.path}".encode())
+
+    gists = [
+        Gist(id="1", files=[
+            GistFile(filename="ok.py", raw_url="https://raw.example/ok.py"),
+            GistFile(filename="dead.py", raw_url="https://raw.example/dead.py"),
+        ]),
+        Gist(id="2", files=[
+            GistFile(filename="broken.py", raw_url="https://raw.example/broken.py"),
+            GistFile(filename="also_ok.py", raw_url="https://raw.example/also_ok.py"),
+        ]),
+    ]
+
+    run_with(handler, lambda scraper: scraper.fetch_all_content(gists))
+
+    contents = {f.filename: f.content for gist in gists for f in gist.files}
+    assert contents == {
+        "ok.py": "# /ok.py",
+        "dead.py": "",
+        "broken.py": "",
+        "also_ok.py": "# /also_ok.py",
+    }
+
+
+class FakeSleep:
+    """Stand-in for asyncio.sleep that records delays instead of waiting"""
+
+    def __init__(self):
+        self.delays = []
+
+    async def __call__(self, delay):
+        self.delays.append(delay)
+
+
+def scripted(*responses):
+    """MockTransport handler that returns the given responses in order, then repeats the last"""
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return responses[min(len(calls), len(responses)) - 1]
+
+    handler.calls = calls
+    return handler
+
+
+def test_get_retries_5xx_with_exponential_backoff(monkeypatch):
+    sleep = FakeSleep()
+    monkeypatch.setattr(asyncio, "sleep", sleep)
+    handler = scripted(httpx.Response(500), httpx.Response(502), httpx.Response(200, json={}))
+
+    response = run_with(handler, lambda scraper: scraper._get("https://api.example/x"))
+
+    assert response.status_code == 200
+    assert len(handler.calls) == 3
+    assert sleep.delays == [1, 2]
+
+
+def test_get_gives_up_after_max_retries(monkeypatch):
+    sleep = FakeSleep()
+    monkeypatch.setattr(asyncio, "sleep", sleep)
+    handler = scripted(httpx.Response(503))
+
+    with pytest.raises(httpx.HTTPStatusError):
+        run_with(handler, lambda scraper: scraper.get_gist("abc"))
+
+    assert len(handler.calls) == GistScraper.MAX_RETRIES
+    assert sleep.delays == [1, 2, 4, 8]
+
+
+def test_get_honours_retry_after_seconds(monkeypatch):
+    sleep = FakeSleep()
+    monkeypatch.setattr(asyncio, "sleep", sleep)
+    handler = scripted(
+        httpx.Response(429, headers={"retry-after": "7"}),
+        httpx.Response(200, json={})
+    )
+
+    response = run_with(handler, lambda scraper: scraper._get("https://api.example/x"))
+
+    assert response.status_code == 200
+    assert sleep.delays == [7]
+
+
+def test_get_honours_retry_after_http_date(monkeypatch):
+    sleep = FakeSleep()
+    monkeypatch.setattr(asyncio, "sleep", sleep)
+    retry_at = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+    handler = scripted(
+        httpx.Response(429, headers={"retry-after": retry_at}),
+        httpx.Response(200, json={})
+    )
+
+    response = run_with(handler, lambda scraper: scraper._get("https://api.example/x"))
+
+    assert response.status_code == 200
+    assert len(sleep.delays) == 1
+    assert 28 <= sleep.delays[0] <= 30
+
+
+@pytest.mark.parametrize("retry_after", ["soon", "3600"])
+def test_get_does_not_retry_unusable_retry_after(monkeypatch, retry_after):
+    sleep = FakeSleep()
+    monkeypatch.setattr(asyncio, "sleep", sleep)
+    handler = scripted(httpx.Response(429, headers={"retry-after": retry_after}))
+
+    with pytest.raises(httpx.HTTPStatusError):
+        run_with(handler, lambda scraper: scraper.get_gist("abc"))
+
+    assert len(handler.calls) == 1
+    assert sleep.delays == []
+
+
+def test_get_waits_for_short_rate_limit_reset(monkeypatch):
+    sleep = FakeSleep()
+    monkeypatch.setattr(asyncio, "sleep", sleep)
+    reset = int(time.time()) + 10
+    handler = scripted(httpx.Response(
+        200, json={}, headers={"x-ratelimit-remaining": "0", "x-ratelimit-reset": str(reset)}
+    ))
+
+    async def two_gets(scraper):
+        await scraper._get("https://api.example/x")
+        await scraper._get("https://api.example/x")
+
+    run_with(handler, two_gets)
+
+    assert len(handler.calls) == 2
+    assert len(sleep.delays) == 1
+    assert 8 <= sleep.delays[0] <= 10
+
+
+def test_get_returns_403_when_rate_limit_reset_is_far_off(monkeypatch):
+    sleep = FakeSleep()
+    monkeypatch.setattr(asyncio, "sleep", sleep)
+    reset = int(time.time()) + 3600
+    handler = scripted(httpx.Response(
+        403, headers={"x-ratelimit-remaining": "0", "x-ratelimit-reset": str(reset)}
+    ))
+
+    with pytest.raises(httpx.HTTPStatusError):
+        run_with(handler, lambda scraper: scraper.get_gist("abc"))
+
+    assert len(handler.calls) == 1
+    assert sleep.delays == []
+
+
+@pytest.mark.parametrize("limit, expected_pages", [
+    (0, []),
+    (30, [(1, 30)]),
+    (100, [(1, 100)]),
+    (250, [(1, 100), (2, 100), (3, 100)]),
+])
+def test_get_public_gists_fetches_pages_to_cover_limit(limit, expected_pages):
+    requested = []
+
+    def handler(request):
+        page = int(request.url.params["page"])
+        per_page = int(request.url.params["per_page"])
+        requested.append((page, per_page))
+        return httpx.Response(200, json=[
+            {"id": f"{page}-{i}", "description": "gist"} for i in range(per_page)
+        ])
+
+    gists = run_with(handler, lambda scraper: scraper.get_public_gists(limit=limit))
+
+    assert sorted(requested) == expected_pages
+    assert len(gists) == limit
+    if limit:
+        assert gists[0].id == "1-0"
+        assert gists[-1].id == f"{len(expected_pages)}-{(limit - 1) % 100}"
+
+
+def test_search_gists_filters_scanned_gists():
+    def handler(request):
+        return httpx.Response(200, json=[
+            {"id": "1", "description": "Parse JSON in Python"},
+            {"id": "2", "description": None, "files": {"json_utils.py": {}}},
+            {"id": "3", "description": "unrelated", "files": {"notes.md": {}}},
+        ])
+
+    gists = run_with(handler, lambda scraper: scraper.search_gists("JSON", limit=3))
+
+    assert [g.id for g in gists] == ["1", "2"]
+
+
+def gist_payload(owner):
+    """A /gists/{id} response shaped like GitHub's, including fields we ignore"""
+    return {
+        "url": "https://api.github.com/gists/aa5a315d",
+        "forks_url": "https://api.github.com/gists/aa5a315d/forks",
+        "id": "aa5a315d",
+        "node_id": "MDQ6R2lzdGFhNWEzMTVk",
+        "html_url": "https://gist.github.com/aa5a315d",
+        "files": {
+            "hello.py": {
+                "filename": "hello.py",
+                "type": "application/x-python",
+                "language": "Python",
+                "raw_url": "https://gist.githubusercontent.com/raw/hello.py",
+                "size": 21,
+                "truncated": False,
+                "content": "print('hello world')\n",
+            },
+            "NOTES": {
+                "filename": "NOTES",
+                "type": "text/plain",
+                "language": None,
+                "raw_url": "https://gist.githubusercontent.com/raw/NOTES",
+                "size": 5,
+                "truncated": False,
+                "content": "notes",
+            },
+        },
+        "public": True,
+        "created_at": "2010-04-14T02:15:15Z",
+        "updated_at": "2011-06-20T11:34:15Z",
+        "description": None,
+        "comments": 0,
+        "user": None,
+        "owner": owner,
+        "truncated": False,
+        "forks": [],
+        "history": [{
+            "version": "57a7f021",
+            "committed_at": "2010-04-14T02:15:15Z",
+            "change_status": {"total": 1, "additions": 1, "deletions": 0},
+        }],
+    }
+
+
+@pytest.mark.parametrize("owner, author", [
+    (None, ""),
+    ({"login": "octocat", "id": 1, "type": "User", "site_admin": False}, "octocat"),
+])
+def test_get_gist_decodes_api_payload(owner, author):
+    def handler(request):
+        assert request.url.path == "/gists/aa5a315d"
+        return httpx.Response(200, json=gist_payload(owner))
+
+    gist = run_with(handler, lambda scraper: scraper.get_gist("aa5a315d"))
+
+    assert gist == Gist(
+        id="aa5a315d",
+        description="",
+        files=[
+            GistFile(
+                filename="hello.py",
+                language="Python",
+                raw_url="https://gist.githubusercontent.com/raw/hello.py",
+                size=21
+            ),
+            GistFile(
+                filename="NOTES",
+                language="",
+                raw_url="https://gist.githubusercontent.com/raw/NOTES",
+                size=5
+            ),
+        ],
+        author=author,
+        created_at="2010-04-14T02:15:15Z",
+        updated_at="2011-06-20T11:34:15Z",
+        public=True,
+        forks_url="https://api.github.com/gists/aa5a315d/forks"
+    )
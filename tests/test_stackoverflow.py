@@ -0,0 +1,231 @@
+import asyncio
+import gc
+import threading
+import warnings
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+from selectolax.lexbor import LexborHTMLParser
+
+from scrapers import stackoverflow
+from scrapers.stackoverflow import StackOverflowScraper
+
+
+SCRAPED_AT = datetime(2024, 1, 1)
+
+SEARCH_HTML = """
+<html><body>
+  <div class="question-summary">
+    <span class="vote-count-post">12</span>
+    <a class="question-hyperlink" href="/questions/111/parse-json">Parse JSON</a>
+  </div>
+  <div class="question-summary">
+    <span class="vote-count-post">1,204</span>
+    <a class="question-hyperlink" href="/questions/222/read-file">Read a file</a>
+  </div>
+  <div class="question-summary">
+    <a class="other-link" href="/questions/333/no-title-link">Ignored</a>
+  </div>
+  <div class="question-summary">
+    <a class="question-hyperlink" href="/questions/444/over-limit">Over limit</a>
+  </div>
+</body></html>
+"""
+
+QUESTION_HTML = """
+<html><body>
+  <a class="question-hyperlink">How do I parse JSON?</a>
+  <div class="answercell">
+    <code>this div is not an answer and must be skipped</code>
+  </div>
+  <div class="answer">
+    <a name="answer-9001"></a>
+    <span class="vote-count-post">42</span>
+    <pre><code>import json
+data = json.loads(text)</code></pre>
+    <code>too short</code>
+  </div>
+  <div class="answer">
+    <span class="vote-count-post">n/a</span>
+    <pre><code>const data = JSON.parse(text);</code></pre>
+  </div>
+</body></html>
+"""
+
+
+@pytest.fixture
+def scraper():
+    scraper = StackOverflowScraper()
+    yield scraper
+    asyncio.run(scraper.close())
+
+
+def test_parse_search_results(scraper):
+    tree = LexborHTMLParser(SEARCH_HTML)
+    snippets = scraper._parse_search_results(tree, "json", 3, SCRAPED_AT)
+
+    assert [s.question_id for s in snippets] == [111, 222]
+    assert [s.question_title for s in snippets] == ["Parse JSON", "Read a file"]
+    assert [s.votes for s in snippets] == [12, 1204]
+    assert snippets[0].url == "https://stackoverflow.com/questions/111/parse-json"
+    assert all(s.code == "" and s.scraped_at == SCRAPED_AT for s in snippets)
+
+
+def test_parse_question_page(scraper):
+    tree = LexborHTMLParser(QUESTION_HTML)
+    snippets = scraper._parse_question_page(tree, 111, SCRAPED_AT)
+
+    assert len(snippets) == 2
+    first, second = snippets
+
+    assert first.snippet_id == "so_111_9001"
+    assert first.answer_id == 9001
+    assert first.question_title == "How do I parse JSON?"
+    assert first.code == "import json\ndata = json.loads(text)"
+    assert first.language == "python"
+    assert first.votes == 42
+    assert first.url == "https://stackoverflow.com/questions/111#answer-9001"
+
+    # No answer anchor: falls back to the answer's position on the page
+    assert second.answer_id == 2
+    assert second.language == "javascript"
+    assert second.votes == 0
+
+
+def test_search_skips_question_pages_that_fail():
+    search_html = """
+    <div class="question-summary"><a class="question-hyperlink" href="/questions/1/a">A</a></div>
+    <div class="question-summary"><a class="question-hyperlink" href="/questions/2/b">B</a></div>
+    <div class="question-summary"><a class="question-hyperlink" href="/questions/3/c">C</a></div>
+    <div class="question-summary"><a class="question-hyperlink" href="/questions/4/d">D</a></div>
+    """
+
+    def handler(request):
+        if request.url.path == "/search":
+            return httpx.Response(200, text=search_html)
+        question_id = request.url.path.split("/")[2]
+        if question_id == "2":
+            return httpx.Response(429)
+        if question_id == "3":
+            raise httpx.ReadTimeout("timed out", request=request)
+        if question_id == "4":
+            return httpx.Response(302, headers={"location": "/questions/4/d"})
+        return httpx.Response(200, text=QUESTION_HTML)
+
+    async def _search():
+        client = httpx.AsyncClient(
+            transport=httpx.MockTransport(handler), follow_redirects=True
+        )
+        async with StackOverflowScraper(client=client) as scraper:
+            try:
+                return await scraper.search("json")
+            finally:
+                await client.aclose()
+
+    snippets = asyncio.run(_search())
+
+    assert [s.question_id for s in snippets] == [1, 1]
+    assert [s.answer_id for s in snippets] == [9001, 2]
+
+
+@pytest.fixture
+def keepalive_url():
+    """URL of a local HTTP/1.1 server that keeps connections alive"""
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"ok")
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/"
+    server.shutdown()
+    server.server_close()
+
+
+def test_shared_client_is_closed_with_its_event_loop(keepalive_url):
+    async def fetch():
+        client = stackoverflow._get_shared_client()
+        assert stackoverflow._get_shared_client() is client
+        response = await client.get(keepalive_url)
+        assert response.status_code == 200
+        return client
+
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always", ResourceWarning)
+
+        # The pooled keep-alive connection is released when asyncio.run() ends
+        first = asyncio.run(fetch())
+        assert first.is_closed
+
+        replacement = asyncio.run(fetch())
+        assert replacement is not first
+
+        # Closing from a later loop must not touch the old loop's connections
+        asyncio.run(stackoverflow.close_shared_client())
+        assert stackoverflow._shared_client is None
+        assert stackoverflow._shared_client_loop is None
+
+        gc.collect()
+
+    assert not [w for w in caught if issubclass(w.category, ResourceWarning)]
+
+
+def test_close_shared_client_on_the_same_loop(keepalive_url):
+    async def fetch_and_close():
+        client = stackoverflow._get_shared_client()
+        await client.get(keepalive_url)
+        await stackoverflow.close_shared_client()
+        return client
+
+    client = asyncio.run(fetch_and_close())
+
+    assert client.is_closed
+    assert stackoverflow._shared_client is None
+
+
+@pytest.mark.parametrize("code, language", [
+    # Literal patterns match case-insensitively, like the regexes
+    ("SELECT id FROM users", "sql"),
+    ("select id from users", "sql"),
+    ("Select * From t", "sql"),
+    # "$" (php) comes before "$(" (bash) in LANGUAGE_PATTERNS order
+    ("ls $(pwd)", "php"),
+    ("if [[ -f x ]]; then ls; fi", "bash"),
+    ("#!/bin/bash\nls -la", "bash"),
+    ("x = 1\nend", "ruby"),
+    # "public class" is a java pattern and java is tried before c#
+    ("public class Foo {}", "java"),
+    ("namespace App { public class Foo {} }", "java"),
+    ("Console.WriteLine(x);", "c#"),
+    ("<?php\n$x = 1;", "php"),
+    ("def greet(name):\n    return name", "python"),
+    ("PRINT(x)", "python"),
+    ("const x = 1;", "javascript"),
+    ("fn main() {}", "rust"),
+    ("hello world", None),
+])
+def test_detect_language(scraper, code, language):
+    assert scraper._detect_language(code) == language
+
+
+@pytest.mark.parametrize("tags, language", [
+    (["golang"], "go"),
+    (["CSharp"], "c#"),
+    (["html", "Python"], "python"),
+    (["Shell"], "shell"),
+    (["html", "css"], None),
+    ([], None),
+])
+def test_extract_language_from_tags(scraper, tags, language):
+    assert scraper.extract_language_from_tags(tags) == language